@@ -5,12 +5,15 @@
 #
 # works of OfficialTeamName (con.d). All rights reserved.
 ##################################################################
+import hashlib
+import hmac
 import traceback
 
 import sqlalchemy.exc
 from sqlalchemy import or_
-from sqlalchemy.orm import sessionmaker
-from werkzeug.security import generate_password_hash
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker, selectinload
+from werkzeug.security import generate_password_hash, check_password_hash
 import random
 from DBStructure import *
 
@@ -31,6 +34,10 @@ DEFAULT_USER_AVATAR_LINK = "avatar/1.png"
 # link to default channel avatar
 DEFAULT_CHANNEL_AVATAR_LINK = "channel_avatar/logo_icon.png"
 
+# method used to hash user passwords. Salted pbkdf2 (hashlib.pbkdf2_hmac) instead of
+# a single round of sha256. Old sha256 hashes are checked and upgraded by check_user_password
+PASSWORD_HASH_METHOD = "pbkdf2:sha256"
+
 
 class ErrorCode(enum.Enum):
     """
@@ -63,7 +70,7 @@ class Modification(enum.Enum):
     MODIFY_DELETE = 1
 
 
-engine = create_engine(DBPATH)
+engine = create_db_engine()
 Session = sessionmaker(engine)
 
 # starting timestamp of UTC
@@ -80,21 +87,133 @@ def try_to_commit(trans):
             and program terminates itself. Otherwise, show error message as a
             warning and rollback this transaction
     """
+    return try_to_bulk_insert_and_commit(trans, [])
+
+
+def try_to_bulk_insert_and_commit(trans, inserts: list):
+    """
+    Bulk insert rows to tables, then commit the transaction (i.e. conn)
+
+    bulk_insert executes its INSERT straight away, so its errors are handled
+    here the same way as commit errors
+
+    :param trans: The transaction to be committed
+    :param inserts: A list of (table class, rows) pairs, each passed to bulk_insert
+    :return: True if the rows are inserted and the transaction is committed.
+            Errors are handled as in try_to_commit
+    """
     if DEBUG_MODE:
+        for model, rows in inserts:
+            bulk_insert(trans, model, rows)
         trans.commit()
         return True
 
     try:
+        for model, rows in inserts:
+            bulk_insert(trans, model, rows)
         trans.commit()
         return True
     except sqlalchemy.exc.SQLAlchemyError:
-        # errors while commit, show as warning
+        # errors while insert or commit, show as warning
         warnings.warn(traceback.format_exc())
         trans.rollback()
         warnings.warn("Transaction is roll-backed")
     return False
 
 
+def insert_ignore_duplicate(conn, model, **values):
+    """
+    Insert a row, or do nothing if a row with the same primary key (or any unique
+    constraint) already exists.
+
+    This is a single INSERT ... ON CONFLICT DO NOTHING statement, so there is no need
+    to query for the row first. Applicable to postgresql and sqlite DB
+
+    :param conn: The Session() initiated
+    :param model: The table class to insert into, e.g. ResourceView
+    :param values: The attribute values of the new row
+    :return True if the row is inserted, False if it already exists
+    """
+    insert = _get_dialect_insert(conn)
+    # key by mapped attribute, as attribute and column names may differ (e.g. UserTeachingAreas.grade)
+    values = {getattr(model, key): value for key, value in values.items()}
+    result = conn.execute(insert(model.__table__).values(values).on_conflict_do_nothing())
+    return result.rowcount > 0
+
+
+def insert_or_update(conn, model, conflict_keys: list, **values):
+    """
+    Insert a row, or if a row with the same conflict_keys already exists,
+    update its other attributes to the given values.
+
+    This is a single INSERT ... ON CONFLICT DO UPDATE statement. Applicable to
+    postgresql and sqlite DB
+
+    :param conn: The Session() initiated
+    :param model: The table class to insert into, e.g. UserTeachingAreas
+    :param conflict_keys: The attribute names of the primary key (or a unique
+                          constraint), e.g. ["uid", "teaching_area"]
+    :param values: The attribute values of the new row
+    """
+    insert = _get_dialect_insert(conn)
+    # key by column, as attribute and column names may differ (e.g. UserTeachingAreas.grade)
+    values = {getattr(model, key).expression: value for key, value in values.items()}
+    conflict_columns = [getattr(model, key).expression for key in conflict_keys]
+    conn.execute(insert(model.__table__).values(values).on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={column: value for column, value in values.items()
+              if column not in conflict_columns}))
+
+
+def _get_dialect_insert(conn):
+    """
+    Get the insert() construct of the DB dialect used, which supports ON CONFLICT
+
+    :param conn: The Session() initiated
+    :return postgresql.insert or sqlite.insert
+    """
+    if conn.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def bulk_insert(conn, model, rows: list):
+    """
+    Insert many rows to a table in one executemany() call, bypassing the ORM
+    unit of work. With postgresql, psycopg2 sends them as multi-VALUES INSERT
+    statements (see create_db_engine)
+
+    :param conn: The Session() initiated
+    :param model: The table class to insert into, e.g. ResourceTagRecord
+    :param rows: A list of dicts of column name -> value, one for each new row
+    :raise sqlalchemy.exc.SQLAlchemyError: The INSERT is executed immediately (not at
+           commit), so e.g. an IntegrityError is raised here. Use
+           try_to_bulk_insert_and_commit to handle it like a commit error
+    """
+    if rows:
+        conn.execute(model.__table__.insert(), rows)
+
+
+def adjust_vote_count(conn, model, key: dict, upvote_delta: int, downvote_delta: int):
+    """
+    Adjust the up/down-vote counts of a Resource, ChannelPost or PostComment row.
+
+    Both counts are updated by a single UPDATE computed by the DB
+    (i.e. SET upvote_count = upvote_count + delta), so the row is not loaded
+    and concurrent votes do not overwrite each other
+
+    :param conn: The Session() initiated
+    :param model: Resource, ChannelPost or PostComment
+    :param key: The primary key of the row to be updated, e.g. {"rid": 1}
+    :param upvote_delta: The change of upvote count
+    :param downvote_delta: The change of downvote count
+    """
+    conn.query(model).filter_by(**key).update(
+        {model.upvote_count: model.upvote_count + upvote_delta,
+         model.downvote_count: model.downvote_count + downvote_delta},
+        synchronize_session=False)
+
+
 def add_user(username, password, email, teaching_areas: dict = None,
              bio=None, avatar_link=DEFAULT_USER_AVATAR_LINK,
              profile_background_link=DEFAULT_PROFILE_BACKGROUND_LINK):
@@ -116,9 +235,9 @@ def add_user(username, password, email, teaching_areas: dict = None,
     """
     email = email.lower()
     user = User(username=username, avatar_link=avatar_link,
-                hash_password=generate_password_hash(password, "sha256"),
+                hash_password=generate_password_hash(password, PASSWORD_HASH_METHOD),
                 email=email, bio=bio,
-                created_at=datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane")),
+                created_at=now_brisbane(),
                 profile_background_link=profile_background_link)
 
     with Session() as conn:
@@ -169,15 +288,10 @@ def modify_user_teaching_areas(uid, conn, modification: Modification,
             is_public = info[0]
         if isinstance(area, Subject):
             if modification == Modification.MODIFY_ADD:
-                # insert new user teaching areas
-                teaching_area = conn.query(UserTeachingAreas). \
-                    filter_by(uid=uid, teaching_area=area,
-                              is_public=is_public, grade=grade).one_or_none()
-                if teaching_area is None:
-                    new_teach_area = UserTeachingAreas(uid=uid, teaching_area=area,
-                                                       is_public=is_public, grade=grade)
-                    warnings.warn("Added new teaching area: " + area.name)
-                    conn.add(new_teach_area)
+                # insert new user teaching areas, re-adding an area updates its is_public/grade
+                insert_or_update(conn, UserTeachingAreas, ["uid", "teaching_area"], uid=uid,
+                                 teaching_area=area, is_public=is_public, grade=grade)
+                warnings.warn("Added new teaching area: " + area.name)
             else:
                 # delete user teaching areas
                 teaching_area = conn.query(UserTeachingAreas). \
@@ -233,14 +347,15 @@ def modify_user(uid: int, username=None, password=None, email=None,
             return ErrorCode.INVALID_USER
 
         if email:
-            if isinstance(User, get_user(email)):
+            email = email.lower()
+            if isinstance(get_user(email), User):
                 warnings.warn("email is already registered")
                 return ErrorCode.EMAIL_USED
             user.email = email
         if username:
             user.username = username
         if password:
-            user.hash_password = generate_password_hash(password, "sha256")
+            user.hash_password = generate_password_hash(password, PASSWORD_HASH_METHOD)
         if profile_background_link != "NULL":
             if not profile_background_link:
                 user.profile_background_link = DEFAULT_PROFILE_BACKGROUND_LINK
@@ -317,6 +432,32 @@ def user_auth(email, login=True):
             return ErrorCode.COMMIT_ERROR
 
 
+def check_user_password(user, password):
+    """
+    Check a password against the hash stored for a user
+
+    Hashes created before PASSWORD_HASH_METHOD was used are of the form
+    sha256$salt$hmac_hex, which werkzeug no longer accepts. These are
+    checked here and replaced by a PASSWORD_HASH_METHOD hash on success
+
+    :param user: The User instance
+    :param password: The password to check
+    :return True if the password matches, False otherwise
+    """
+    method, _, salt_and_hash = user.hash_password.partition("$")
+    if method != "sha256":
+        return check_password_hash(user.hash_password, password)
+
+    # legacy hash, as generated by werkzeug < 2.3
+    salt, _, hash_value = salt_and_hash.partition("$")
+    expected = hmac.new(salt.encode(), password.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, hash_value):
+        return False
+    # upgrade to the current hash method
+    modify_user(user.uid, password=password)
+    return True
+
+
 def add_tag(tag_name, tag_description=None):
     """
     Add a new tag to Database
@@ -407,7 +548,7 @@ def add_resource(title, resource_link, difficulty: ResourceDifficulty, subject:
         warnings.warn("Please specify the User allowed to access this resource")
         return ErrorCode.INCORRECT_PERSONNEL
 
-    created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+    created_at = now_brisbane()
     resource = Resource(title=title, resource_link=resource_link, grade=grade,
                         difficulty=difficulty, subject=subject, is_public=is_public,
                         description=description, created_at=created_at)
@@ -434,29 +575,18 @@ def add_resource(title, resource_link, difficulty: ResourceDifficulty, subject:
         if tags_id:
             tags_id = list(set(tags_id))
 
-        for i in resource_thumbnail_links:
-            thumbnail = ResourceThumbnail(rid=resource.rid, thumbnail_link=i)
-            conn.add(thumbnail)
-
-        for i in creaters_id:
-            creater_instance = ResourceCreater(rid=resource.rid, uid=i)
-            conn.add(creater_instance)
-
-            # creaters must have access to this resource
-            if not is_public and i not in private_personnel_id:
-                private_access = PrivateResourcePersonnel(rid=resource.rid, uid=i)
-                conn.add(private_access)
+        inserts = [(ResourceThumbnail,
+                    [{"rid": resource.rid, "thumbnail_link": i} for i in resource_thumbnail_links]),
+                   (ResourceCreater, [{"rid": resource.rid, "uid": i} for i in creaters_id])]
 
         if not is_public:
-            for uid in private_personnel_id:
-                private_access = PrivateResourcePersonnel(rid=resource.rid, uid=uid)
-                conn.add(private_access)
+            # creaters must have access to this resource
+            personnel = set(private_personnel_id).union(creaters_id)
+            inserts.append((PrivateResourcePersonnel,
+                            [{"rid": resource.rid, "uid": i} for i in personnel]))
 
-        if tags_id:
-            for i in tags_id:
-                tag_record = ResourceTagRecord(rid=resource.rid, tag_id=i)
-                conn.add(tag_record)
-        if not try_to_commit(conn):
+        inserts.append((ResourceTagRecord, [{"rid": resource.rid, "tag_id": i} for i in tags_id]))
+        if not try_to_bulk_insert_and_commit(conn, inserts):
             warnings.warn(f"resource {title} creation failed")
             # roll back process
             conn.delete(resource)
@@ -515,8 +645,7 @@ def modify_resource_personnel(rid, uid, modification: Modification):
             msg = "deleted"
         else:
             # add
-            personnel = PrivateResourcePersonnel(uid=uid, rid=rid)
-            conn.add(personnel)
+            insert_ignore_duplicate(conn, PrivateResourcePersonnel, uid=uid, rid=rid)
             msg = "added"
         if not try_to_commit(conn):
             warnings.warn(f"User {uid} cannot be added to personnel of resource {rid}")
@@ -945,7 +1074,8 @@ def find_channel_posts(cid: int, sort_algo: str = "date", title_type="like", tit
     """
     Returns a list of channel posts in a channel
 
-    By default it is sort by latest post date
+    By default it is sort by latest post date. The comments of each post are
+    loaded as well, accessible as post.post_comment (oldest first)
 
     :param cid: The id of the channel
     :param sort_algo: "date" - sort by latest date; "upvote" - sort by highest upvote counts
@@ -959,8 +1089,9 @@ def find_channel_posts(cid: int, sort_algo: str = "date", title_type="like", tit
         title_type = "like"
 
     with Session() as conn:
-        # posts = conn.query(ChannelPost)
-        posts = conn.query(ChannelPost).filter_by(cid=cid)
+        # load comments (and commenters) of all posts in one query each, rather than per post
+        posts = conn.query(ChannelPost).filter_by(cid=cid). \
+            options(selectinload(ChannelPost.post_comment).selectinload(PostComment.commenter))
         if title:
             if title_type == "like":
                 posts = posts.filter(ChannelPost.title.ilike(f'%{title}%'))
@@ -998,8 +1129,6 @@ def vote_resource(uid, rid, upvote=True):
     if isinstance(res, ErrorCode):
         return res
 
-    user, resource = res
-
     with Session() as conn:
         # try to find if there is an entry in vote_info
         vote_info = conn.query(ResourceVoteInfo).filter_by(uid=uid, rid=rid).one_or_none()
@@ -1011,11 +1140,9 @@ def vote_resource(uid, rid, upvote=True):
 
                 # update resource vote count
                 if upvote:
-                    resource.downvote_count -= 1
-                    resource.upvote_count += 1
+                    adjust_vote_count(conn, Resource, {"rid": rid}, 1, -1)
                 else:
-                    resource.downvote_count += 1
-                    resource.upvote_count -= 1
+                    adjust_vote_count(conn, Resource, {"rid": rid}, -1, 1)
                 msg = "updated"
             else:
                 if VERBOSE:
@@ -1026,12 +1153,11 @@ def vote_resource(uid, rid, upvote=True):
             vote_info = ResourceVoteInfo(rid=rid, uid=uid, is_upvote=upvote)
 
             if upvote:
-                resource.upvote_count += 1
+                adjust_vote_count(conn, Resource, {"rid": rid}, 1, 0)
             else:
-                resource.downvote_count += 1
+                adjust_vote_count(conn, Resource, {"rid": rid}, 0, 1)
 
         conn.add(vote_info)
-        conn.add(resource)
         if not try_to_commit(conn):
             warnings.warn(f"user {uid} vote resource {rid} failed")
             return ErrorCode.COMMIT_ERROR
@@ -1071,8 +1197,8 @@ def user_viewed_resource(uid, rid):
         return res
 
     with Session() as conn:
-        resource_view = ResourceView(rid=rid, uid=uid)
-        conn.add(resource_view)
+        # a user viewing the same resource again keeps the first view record
+        insert_ignore_duplicate(conn, ResourceView, rid=rid, uid=uid, created_at=now_brisbane())
         if not try_to_commit(conn):
             warnings.warn(f"User {uid} view resource {rid} record cannot be committed")
             return ErrorCode.COMMIT_ERROR
@@ -1113,7 +1239,7 @@ def comment_to_resource(uid, rid, comment):
     if isinstance(res, ErrorCode):
         return res
 
-    created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+    created_at = now_brisbane()
     with Session() as conn:
         resource_comment = ResourceComment(uid=uid, rid=rid, comment=comment, created_at=created_at)
         conn.add(resource_comment)
@@ -1161,7 +1287,7 @@ def reply_to_resource_comment(uid, resource_comment_id, reply):
             warnings.warn("uid is invalid")
             return ErrorCode.INVALID_USER
 
-        created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+        created_at = now_brisbane()
         reply_to_comment = ResourceCommentReply(resource_comment_id=resource_comment_id,
                                                 reply=reply, uid=uid, created_at=created_at)
         conn.add(reply_to_comment)
@@ -1172,7 +1298,7 @@ def reply_to_resource_comment(uid, resource_comment_id, reply):
             print(f"user {uid} replied to resource comment {resource_comment_id}")
 
 
-def remove_resource_comment_reply(resource_comment_id: int, created_at=None):
+def remove_resource_comment_reply(resource_comment_id: int, created_at=None, reply_id: int = None):
     """
     Remove a resource comment reply. If any matches for
      (resource_comment_id, created_at)
@@ -1180,14 +1306,18 @@ def remove_resource_comment_reply(resource_comment_id: int, created_at=None):
      If created_at is None, simply delete all comment replies that link to a
      resource comment.
 
-     * Since resource comment reply does not have a unique identifier,
-     this operation may be non-deterministic
+     * If reply_id is supplied, it has precedence over (resource_comment_id, created_at)
+     and exactly that reply is removed. Otherwise, this operation may be non-deterministic
 
      :param resource_comment_id: The resource comment the replies related to
      :param created_at: The datetime when replies to be deleted was created
+     :param reply_id: The id of the reply to be removed
     """
     with Session() as conn:
-        if created_at:
+        if reply_id:
+            resource_comment_reply = conn.query(ResourceCommentReply). \
+                filter_by(reply_id=reply_id).one_or_none()
+        elif created_at:
             resource_comment_reply = conn.query(ResourceCommentReply). \
                 filter_by(resource_comment_id=resource_comment_id,
                           created_at=created_at).one_or_none()
@@ -1203,11 +1333,17 @@ def get_resource_comments(rid: int) -> list:
     """
     Load and returns a list of resource comments for a resource
 
+    The commenter (comment.user) and replies (comment.resource_comment_reply,
+    each with reply.replier) are loaded as well
+
     :param rid: The resource id
     :return a list of all comment instances to this resource, if any
     """
     with Session() as conn:
-        return conn.query(ResourceComment).filter_by(rid=rid).all()
+        return conn.query(ResourceComment).filter_by(rid=rid). \
+            options(selectinload(ResourceComment.user),
+                    selectinload(ResourceComment.resource_comment_reply).
+                    selectinload(ResourceCommentReply.replier)).all()
 
 
 def get_resource_comment_replies(resource_comment_instance_list: list) -> dict:
@@ -1264,7 +1400,7 @@ def create_channel(name, visibility: ChannelVisibility, admin_uid, subject: Subj
             warnings.warn("Admin id is invalid")
             return ErrorCode.INVALID_USER
 
-        created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+        created_at = now_brisbane()
         # phase 1: create instance
         channel = Channel(name=name, visibility=visibility, admin_uid=admin_uid,
                           subject=subject, grade=grade, description=description,
@@ -1282,20 +1418,14 @@ def create_channel(name, visibility: ChannelVisibility, admin_uid, subject: Subj
         if personnel_id:
             personnel_id = list(set(personnel_id))
 
-        for i in tags_id:
-            channel_tag_record = ChannelTagRecord(tag_id=i, cid=channel.cid)
-            conn.add(channel_tag_record)
+        inserts = [(ChannelTagRecord, [{"tag_id": i, "cid": channel.cid} for i in tags_id])]
 
         if visibility != ChannelVisibility.PUBLIC:
-            if admin_uid not in personnel_id:
-                # add admin to personnel if not in personnel id yet
-                personnel = ChannelPersonnel(cid=channel.cid, uid=admin_uid)
-                conn.add(personnel)
-            for i in personnel_id:
-                personnel = ChannelPersonnel(cid=channel.cid, uid=i)
-                conn.add(personnel)
+            # admin must be in the personnel
+            personnel = set(personnel_id).union([admin_uid])
+            inserts.append((ChannelPersonnel, [{"cid": channel.cid, "uid": i} for i in personnel]))
 
-        if not try_to_commit(conn):
+        if not try_to_bulk_insert_and_commit(conn, inserts):
             warnings.warn(f"channel {name} cannot be created")
             # delete obsolete channel object
             conn.delete(channel)
@@ -1386,8 +1516,7 @@ def modify_channel_personnel(uid, cid, modification: Modification):
             msg = "deleted"
         else:
             # add
-            personnel = ChannelPersonnel(cid=cid, uid=uid)
-            conn.add(personnel)
+            insert_ignore_duplicate(conn, ChannelPersonnel, cid=cid, uid=uid)
             msg = "created"
 
         if not try_to_commit(conn):
@@ -1559,7 +1688,7 @@ def post_on_channel(uid, title, text, channel_name=None, cid=None):
                 warnings.warn(f"User {uid} is not in channel {channel.name}")
                 return ErrorCode.INCORRECT_PERSONNEL
 
-        created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+        created_at = now_brisbane()
         channel_post = ChannelPost(uid=uid, cid=channel.cid, title=title, init_text=text,
                                    created_at=created_at)
         conn.add(channel_post)
@@ -1635,7 +1764,7 @@ def comment_on_channel_post(uid, post_id, text):
             warnings.warn("post_id is invalid")
             return ErrorCode.INVALID_POST
 
-        created_at = datetime.datetime.now(tz=pytz.timezone("Australia/Brisbane"))
+        created_at = now_brisbane()
         post_comment = PostComment(post_id=post_id, uid=uid, created_at=created_at,
                                    text=text)
         conn.add(post_comment)
@@ -1679,8 +1808,9 @@ def vote_channel_post(uid, post_id, upvote=True):
             ErrorCode.COMMIT_ERROR if cannot commit (used when DEBUG_MODE is False)
     """
     with Session() as conn:
-        user = conn.query(User).filter_by(uid=uid).one_or_none()
-        post = conn.query(ChannelPost).filter_by(post_id=post_id).one_or_none()
+        # existence checks only, the vote counts are updated without loading the post
+        user = conn.query(User.uid).filter_by(uid=uid).one_or_none()
+        post = conn.query(ChannelPost.post_id).filter_by(post_id=post_id).one_or_none()
         if not user:
             warnings.warn("uid is invalid")
             return ErrorCode.INVALID_USER
@@ -1697,11 +1827,9 @@ def vote_channel_post(uid, post_id, upvote=True):
 
                 # update resource vote count
                 if upvote:
-                    post.downvote_count -= 1
-                    post.upvote_count += 1
+                    adjust_vote_count(conn, ChannelPost, {"post_id": post_id}, 1, -1)
                 else:
-                    post.downvote_count += 1
-                    post.upvote_count -= 1
+                    adjust_vote_count(conn, ChannelPost, {"post_id": post_id}, -1, 1)
             else:
                 if VERBOSE:
                     warnings.warn("user cannot vote the same item twice")
@@ -1710,12 +1838,11 @@ def vote_channel_post(uid, post_id, upvote=True):
             # new vote
             vote = ChannelPostVoteInfo(uid=uid, post_id=post_id, is_upvote=upvote)
             if upvote:
-                post.upvote_count += 1
+                adjust_vote_count(conn, ChannelPost, {"post_id": post_id}, 1, 0)
             else:
-                post.downvote_count += 1
+                adjust_vote_count(conn, ChannelPost, {"post_id": post_id}, 0, 1)
 
         conn.add(vote)
-        conn.add(post)
         if not try_to_commit(conn):
             warnings.warn(f"User {uid} failed vote to post {post_id}")
             return ErrorCode.COMMIT_ERROR
@@ -1738,9 +1865,10 @@ def vote_channel_post_comment(uid, post_comment_id, upvote=True):
             ErrorCode.COMMIT_ERROR if cannot commit (used when DEBUG_MODE is False)
     """
     with Session() as conn:
-        user = conn.query(User).filter_by(uid=uid).one_or_none()
-        post_comment = conn.query(PostComment).filter_by(post_comment_id=post_comment_id). \
-            one_or_none()
+        # existence checks only, the vote counts are updated without loading the comment
+        user = conn.query(User.uid).filter_by(uid=uid).one_or_none()
+        post_comment = conn.query(PostComment.post_comment_id). \
+            filter_by(post_comment_id=post_comment_id).one_or_none()
         if not user:
             warnings.warn("uid is invalid")
             return ErrorCode.INVALID_USER
@@ -1758,11 +1886,9 @@ def vote_channel_post_comment(uid, post_comment_id, upvote=True):
 
                 # update resource vote count
                 if upvote:
-                    post_comment.downvote_count -= 1
-                    post_comment.upvote_count += 1
+                    adjust_vote_count(conn, PostComment, {"post_comment_id": post_comment_id}, 1, -1)
                 else:
-                    post_comment.downvote_count += 1
-                    post_comment.upvote_count -= 1
+                    adjust_vote_count(conn, PostComment, {"post_comment_id": post_comment_id}, -1, 1)
             else:
                 if VERBOSE:
                     warnings.warn("user cannot vote the same item twice")
@@ -1772,12 +1898,11 @@ def vote_channel_post_comment(uid, post_comment_id, upvote=True):
             vote = PostCommentVoteInfo(uid=uid, post_comment_id=post_comment_id,
                                        is_upvote=upvote)
             if upvote:
-                post_comment.upvote_count += 1
+                adjust_vote_count(conn, PostComment, {"post_comment_id": post_comment_id}, 1, 0)
             else:
-                post_comment.downvote_count += 1
+                adjust_vote_count(conn, PostComment, {"post_comment_id": post_comment_id}, 0, 1)
 
         conn.add(vote)
-        conn.add(post_comment)
         if not try_to_commit(conn):
             warnings.warn(f"User {uid} failed to vote post {post_comment_id}")
             return ErrorCode.COMMIT_ERROR
@@ -10,7 +10,7 @@ from random import choice, sample, randint
 from faker import Faker
 import pagan
 
-engine = create_engine(DBPATH)
+engine = init_db()
 
 Session = sessionmaker(engine)
 
@@ -13,7 +13,6 @@ import warnings
 import os
 import posixpath
 from flask_login import LoginManager, login_required, login_user, logout_user, current_user, AnonymousUserMixin
-from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import HTTPException, InternalServerError
 from re import search as re_search
@@ -53,9 +52,8 @@ class Anonymous(AnonymousUserMixin):
         # profile background link
         self.profile_background_link = "img/placeholder.png"
         # user account created time
-        self.created_at = datetime.datetime.now(
-            tz=pytz.timezone("Australia/Brisbane"))
-        # user hash_password -- sha256 encoded
+        self.created_at = now_brisbane()
+        # user hash_password -- salted pbkdf2:sha256 hash
         self.hash_password = ""
         # user honor rating
         self.user_rating = 0
@@ -80,9 +78,8 @@ if DEMO:
             # profile background link
             self.profile_background_link = "img/placeholder.png"
             # user account created time
-            self.created_at = datetime.datetime.now(
-                tz=pytz.timezone("Australia/Brisbane"))
-            # user hash_password -- sha256 encoded
+            self.created_at = now_brisbane()
+            # user hash_password -- salted pbkdf2:sha256 hash
             self.hash_password = "demo"
             # user honor rating
             self.user_rating = 0
@@ -270,7 +267,7 @@ def login():
 
         if email:
             user = get_user(email)
-            if user != ErrorCode.INVALID_USER and check_password_hash(user.hash_password, form.password.data):
+            if user != ErrorCode.INVALID_USER and check_user_password(user, form.password.data):
                 user_auth(user.email, True)
                 login_user(user, remember=False)
                 if 'next' in request.args and request.args.get("next") != 'https://officialteamname.uqcloud.net/logout':
@@ -684,20 +681,18 @@ def resourceComment():
     comms = get_resource_comments(res.rid)
     comments = []
     for comment in comms:
-        replies = get_resource_comment_replies([comment])
         rep = []
-        if comment in replies:
-            for reply in replies[comment]:
-                rep.append({
-                    "reply": reply.serialize,
-                    "author": get_user_and_resource_instance(reply.uid, -1)[0].serialize
-                })
+        for reply in comment.resource_comment_reply:
+            rep.append({
+                "reply": reply.serialize,
+                "author": reply.replier.serialize
+            })
 
         comments.append({
             "comment": comment.serialize,
             "resource_comment_id": comment.resource_comment_id,
             "replies": rep,
-            "author": get_user_and_resource_instance(comment.uid, -1)[0].serialize
+            "author": comment.user.serialize
         })
     return jsonify(comments[::-1])
 
@@ -895,7 +890,7 @@ def settings():
 
         user, _ = get_user_and_resource_instance(uid=current_user.uid, rid=-1)
 
-        if not old_password and not check_password_hash(user.hash_password, old_password):
+        if not old_password and not check_user_password(user, old_password):
             # old password does not match, do not change password
             new_password = None
 
@@ -1222,20 +1217,19 @@ def search_channel_post(cid=None):
             poster_avatar_link = poster.avatar_link
             poster_username = poster.username
 
-            post_comments = get_channel_post_comments(post_id=i.post_id)
+            # loaded by find_channel_posts, oldest first
+            post_comments = i.post_comment
             comments_count = len(post_comments)
 
             recent_comment_time, recent_commenter_name = None, None
             if comments_count != 0:
-                most_recent_comment = conn.query(PostComment).filter_by(post_id=i.post_id). \
-                    order_by(PostComment.created_at.desc()).first()
+                most_recent_comment = post_comments[-1]
                 recent_comment_time = most_recent_comment.created_at
                 # convert to local time
                 recent_comment_time = \
-                    recent_comment_time.astimezone(pytz.timezone("Australia/Brisbane")). \
+                    recent_comment_time.astimezone(BRISBANE_TZ). \
                         strftime("%d/%m/%Y, %H:%M:%S")
-                recent_commenter_name = conn.query(User). \
-                    filter_by(uid=most_recent_comment.uid).first().username
+                recent_commenter_name = most_recent_comment.commenter.username
             info["comment_count"] = comments_count
             info["recent_comment_time"] = recent_comment_time
             info["recent_commenter_name"] = recent_commenter_name